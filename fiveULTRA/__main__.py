@@ -1,19 +1,38 @@
 import sys
 import argparse
+import csv
 import logging
 import os
+import resource
 import tempfile
-import gzip
-import shutil
 import time
 
-from .scripts.filter_input import filter_input  # Use absolute imports
-from .scripts.detection import process_variants, load_vcf_data, load_tsv_data
+from .scripts.filter_input import filter_input, iter_filtered_lines  # Use absolute imports
+from .scripts.detection import process_variants
 from .scripts.score import score_variants
 from .scripts.spliceai1 import process_spliceai_1
 from .scripts.spliceai2 import process_variants_spliceai_2
 from .scripts.spliceai3 import process_variants_spliceai_3
 
+def _resource_usage():
+    """Snapshots user/sys CPU seconds for this process and its children."""
+    ru_self = resource.getrusage(resource.RUSAGE_SELF)
+    ru_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (ru_self.ru_utime + ru_children.ru_utime,
+            ru_self.ru_stime + ru_children.ru_stime)
+
+def _log_stage_metrics(stage, start_time, usage_start):
+    """Logs wall-clock, CPU-time delta and peak memory for a pipeline stage.
+
+    The CPU split shows whether a stage is compute- or I/O-bound, which is
+    what decides whether adding --threads will help it."""
+    user_start, sys_start = usage_start
+    user_end, sys_end = _resource_usage()
+    maxrss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+    elapsed = time.time() - start_time
+    logging.info(f"{stage} execution time: {elapsed:.2f}s "
+                 f"(user={user_end - user_start:.2f}s sys={sys_end - sys_start:.2f}s maxrss={maxrss_mb}MB)")
+
 def get_options():
     parser = argparse.ArgumentParser(
         prog="5ULTRA",
@@ -43,6 +62,8 @@ def get_options():
     advanced_group.add_argument('--data-dir', metavar='data_path', type=str,
                                 default=os.path.join(os.path.expanduser("~"), ".5ULTRA", "data"),
                                 help='Path to the data directory for SpliceAI resources')
+    advanced_group.add_argument('--threads', metavar='N', type=int, default=1,
+                                help='Number of worker processes for the SpliceAI stages')
 
     args = parser.parse_args()
     return args
@@ -55,8 +76,15 @@ def main():
     data_dir = args.data_dir
     full_anno = args.full
     mane = args.mane
+    threads = args.threads
     cutoff = 0.2
 
+    if threads > 1:
+        # Cap the BLAS/OpenMP pools inside each worker so the process pool
+        # does not oversubscribe the machine; explicit user settings win.
+        os.environ.setdefault('OMP_NUM_THREADS', '1')
+        os.environ.setdefault('MKL_NUM_THREADS', '1')
+
     # Set up logging
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -78,80 +106,84 @@ def main():
 
     # Create temporary directory
     with tempfile.TemporaryDirectory(prefix="pipeline_tmp.") as tmp_dir:
-        # Unzip input file if necessary
-        if input_file.endswith('.gz'):
-            start_time = time.time()
-            unzipped_filename = os.path.basename(input_file[:-3])
-            unzipped_path = os.path.join(tmp_dir, unzipped_filename)
-            logging.info(f"Unzipping input file '{input_file}'...")
-            try:
-                with gzip.open(input_file, 'rb') as f_in, open(unzipped_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-                input_file = unzipped_path
-            except OSError as e:
-                logging.error(f"Failed to unzip '{input_file}': {e}")
-                sys.exit(1)
-            end_time = time.time()
-            logging.info(f"Unzipping input file execution time: {int(end_time - start_time)} seconds")
-
-        # Paths to scripts and data
-        required_data_file = os.path.join(os.path.expanduser(data_dir), '5UTRs.intervals.bed')
-        if not os.path.isfile(required_data_file):
-            logging.error(f"Database file '{required_data_file}' not found.")
-            sys.exit(1)
-
-        # Filter VCF/TSV data for 5'UTRs
-        start_time = time.time()
-        filtered_output = os.path.join(tmp_dir, f"5UTR.{os.path.basename(output_file)}.tsv")
-        logging.info("Filtering input file for 5'UTRs...")
+        # Gzipped inputs are decompressed on the fly by the 5'UTR filter, so
+        # no unzipped copy of the input is written to the temp directory.
+
+        # Paths to scripts and data. One scandir of the data directory
+        # checks every file this run will need up front, so a missing
+        # resource fails immediately and all gaps are reported together.
+        expanded_data_dir = os.path.expanduser(data_dir)
+        required_data_files = {'5UTRs.intervals.bed', '5UTRs.tsv', 'uORFs.tsv',
+                               'random_forest_model.pkl', 'onehot_encoder.pkl'}
+        if splice:
+            required_data_files |= {'Introns.tsv', 'spliceai100.5UTRs.masked.snvs.hg38.vcf.gz'}
         try:
-            filter_input(input_file, required_data_file, filtered_output)
-        except Exception as e:
-            logging.error(f"Filter-input failed with error: {e}")
+            present = {entry.name for entry in os.scandir(expanded_data_dir)}
+        except OSError as e:
+            logging.error(f"Cannot read data directory '{expanded_data_dir}': {e}")
             sys.exit(1)
-
-        end_time = time.time()
-        logging.info(f"5'UTR filtering execution time: {int(end_time - start_time)} seconds")
+        missing = sorted(required_data_files - present)
+        if missing:
+            logging.error(f"Database file(s) missing from '{expanded_data_dir}': {', '.join(missing)}")
+            sys.exit(1)
+        required_data_file = os.path.join(expanded_data_dir, '5UTRs.intervals.bed')
 
         # Conditional SpliceAI Processing
         if splice:
+            # Filter VCF/TSV data for 5'UTRs
+            start_time = time.time()
+            usage_start = _resource_usage()
+            filtered_output = os.path.join(tmp_dir, f"5UTR.{os.path.basename(output_file)}.tsv")
+            logging.info("Filtering input file for 5'UTRs...")
+            try:
+                filter_input(input_file, required_data_file, filtered_output)
+            except Exception as e:
+                logging.error(f"Filter-input failed with error: {e}")
+                sys.exit(1)
+
+            _log_stage_metrics("5'UTR filtering", start_time, usage_start)
+
             # spliceai Detection processing
             # Use consistent naming for splice output files
-            splice_1_output = os.path.join(tmp_dir, f"splice1.5UTR.{base}.tsv")
-            splice_2_output = os.path.join(tmp_dir, f"splice2.5UTR.{base}.tsv")
-            splice_3_output = os.path.join(tmp_dir, f"splice3.5UTR.{base}.tsv")
+            # Intermediates are level-1 gzipped: the stages and scoring all
+            # read/write .gz transparently, and the compressed TSVs are
+            # several times smaller on disk.
+            splice_1_output = os.path.join(tmp_dir, f"splice1.5UTR.{base}.tsv.gz")
+            splice_2_output = os.path.join(tmp_dir, f"splice2.5UTR.{base}.tsv.gz")
+            splice_3_output = os.path.join(tmp_dir, f"splice3.5UTR.{base}.tsv.gz")
             start_time = time.time()
+            usage_start = _resource_usage()
             logging.info("Running splice detection on filtered output...")
             try:
-                process_spliceai_1(filtered_output, splice_1_output, data_dir, cutoff)
-                process_variants_spliceai_2(splice_1_output, splice_2_output, data_dir, cutoff)
-                process_variants_spliceai_3(splice_2_output, splice_3_output, data_dir)
+                process_spliceai_1(filtered_output, splice_1_output, data_dir, cutoff, threads=threads)
+                process_variants_spliceai_2(splice_1_output, splice_2_output, data_dir, cutoff, threads=threads)
+                process_variants_spliceai_3(splice_2_output, splice_3_output, data_dir, threads=threads)
             except Exception as e:
                 logging.error(f"splice Detection failed with error: {e}")
                 sys.exit(1)
-            end_time = time.time()
-            logging.info(f"5'UTR splice detection execution time: {int(end_time - start_time)} seconds")
+            _log_stage_metrics("5'UTR splice detection", start_time, usage_start)
             scoring_input = splice_3_output
         else:
-            # Detection processing
+            # Detection processing: the 5'UTR filter streams its lines
+            # straight into detection, so no intermediate filtered TSV is
+            # written for this path.
             detection_output = os.path.join(tmp_dir, f"Detection.5UTR.{base}.tsv") # Use base here too
             start_time = time.time()
-            logging.info("Running detection on filtered output...")
+            usage_start = _resource_usage()
+            logging.info("Filtering input file for 5'UTRs and running detection...")
             try:
-                if filtered_output.endswith('.vcf'):
-                    variants = load_vcf_data(filtered_output)
-                else:
-                    variants = load_tsv_data(filtered_output)
+                filtered_lines = iter_filtered_lines(input_file, required_data_file)
+                variants = list(csv.reader(filtered_lines, delimiter='\t'))
                 process_variants(variants, detection_output, data_dir)
             except Exception as e:
                 logging.error(f"Detection failed with error: {e}")
                 sys.exit(1)
-            end_time = time.time()
-            logging.info(f"5'UTR detection execution time: {int(end_time - start_time)} seconds")
+            _log_stage_metrics("5'UTR detection", start_time, usage_start)
             scoring_input = detection_output
 
         # Run Scoring
         start_time = time.time()
+        usage_start = _resource_usage()
         logging.info("Running scoring...")
         try:
             # Always use the user-specified or default output_file
@@ -162,13 +194,11 @@ def main():
             logging.error(f"Scoring failed with error: {e}")
             sys.exit(1)
 
-        end_time = time.time()
-        logging.info(f"Scoring execution time: {int(end_time - start_time)} seconds")
+        _log_stage_metrics("Scoring", start_time, usage_start)
 
     # Calculate and print total execution time
     end_time_total = time.time()
-    total_time = int(end_time_total - start_time_total)
-    logging.info(f"Total execution time: {total_time} seconds")
+    logging.info(f"Total execution time: {end_time_total - start_time_total:.2f} seconds")
     logging.info(f"Results available: {output_file}")
 
 if __name__ == '__main__':
@@ -1,31 +1,47 @@
 import csv
-import ast
 from math import nan
 from collections import defaultdict
+from functools import lru_cache
 import pysam
 import os
 
-BASE_PAIRING = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G', 'N': 'N', '*': '*'}
+_COMPLEMENT = str.maketrans('ATGCN*', 'TACGN*')
 KOZAK_STRENGTH = {'Weak': 0, 'Adequate': 1, 'Strong': 2, '': nan}
 STOP_CODONS = {'TAA', 'TAG', 'TGA'}
 
 def rev_seq(fwd_seq):
     """Reverse complements a DNA sequence."""
-    return ''.join(BASE_PAIRING.get(nuc, 'N') for nuc in reversed(fwd_seq))
+    return fwd_seq.translate(_COMPLEMENT)[::-1]
 
-def is_valid_number(value):
-    """Checks if a value can be converted to a float."""
-    try:
-        float(value)
-        return True
-    except ValueError:
-        return False
+def parse_exons(field):
+    """Parses a `"[(start, end), ...]"` exon field into a list of int pairs.
+
+    The field is always a literal list of integer tuples, so a split-based
+    parser is used instead of `ast.literal_eval`."""
+    exons = []
+    for chunk in field.strip('[] ').split('),'):
+        start, end = chunk.strip(' ()').split(',')
+        exons.append((int(start), int(end)))
+    return exons
+
+def parse_scores(values):
+    """Converts raw score strings to floats, skipping empty or malformed values."""
+    scores = []
+    for value in values:
+        if not value:
+            continue
+        try:
+            scores.append(float(value))
+        except ValueError:
+            pass
+    return scores
 
 def calculate_distance_from_five_cap(exons, strand, position):
-    """Calculates the distance from the 5' cap to a given genomic position."""
-    exons.sort(key=lambda x: x[0])
+    """Calculates the distance from the 5' cap to a given genomic position.
+
+    Assumes `exons` is already sorted by start position."""
     distance = 0
-    exons = exons if strand == '+' else list(reversed(exons))
+    exons = exons if strand == '+' else reversed(exons)
     for exon_start, exon_end in exons:
         if (strand == '+' and exon_end < position) or (strand == '-' and exon_start > position):
             distance += exon_end - exon_start + 1
@@ -35,9 +51,10 @@ def calculate_distance_from_five_cap(exons, strand, position):
     return distance
 
 def calculate_genomic_position_from_five_cap(exons, strand, distance):
-    """Calculates the genomic position from a given distance from the 5' cap."""
-    exons.sort(key=lambda x: x[0])
-    exons = exons if strand == '+' else list(reversed(exons))
+    """Calculates the genomic position from a given distance from the 5' cap.
+
+    Assumes `exons` is already sorted by start position."""
+    exons = exons if strand == '+' else reversed(exons)
     remaining_distance = distance
     for exon_start, exon_end in exons:
         exon_length = exon_end - exon_start + 1
@@ -65,17 +82,19 @@ def load_vcf_data(vcf_path):
     """Loads VCF data from a file."""
     data = []
     try:
-        with open(vcf_path, 'r') as file:
+        # Read raw bytes and decode only the fields that are kept; skipping
+        # the meta-information lines on the byte prefix avoids per-line
+        # decoding of headers on large multisample VCFs.
+        with open(vcf_path, 'rb') as file:
             for line in file:
-                if line.startswith('##'):
+                if line[:2] == b'##':
                     continue
-                elif line.startswith('#CHROM'):
-                    parts = line.strip().split('\t')
-                    data.append(parts)
+                parts = line.strip().split(b'\t')
+                if line[:6] == b'#CHROM':
+                    data.append([part.decode() for part in parts])
                 else:
-                    parts = line.strip().split('\t')
-                    row = parts[:9]
-                    genotypes = [part.split(':')[0] for part in parts[9:]]
+                    row = [part.decode() for part in parts[:9]]
+                    genotypes = [part.split(b':', 1)[0].decode() for part in parts[9:]]
                     data.append(row + genotypes)
     except FileNotFoundError:
         print(f"File not found: {vcf_path}")
@@ -87,21 +106,33 @@ def calculate_kozak_strength(kozak_sequence):
     """Determines the Kozak sequence strength."""
     if not kozak_sequence or len(kozak_sequence) < 9:
         return ''
-    conditions = [kozak_sequence[1] in ['A', 'G'], kozak_sequence[-2] == 'G']
-    if all(conditions):
+    purine_minus_three = kozak_sequence[1] == 'A' or kozak_sequence[1] == 'G'
+    guanine_plus_four = kozak_sequence[-2] == 'G'
+    if purine_minus_three and guanine_plus_four:
         return 'Strong'
-    elif any(conditions):
+    elif purine_minus_three or guanine_plus_four:
         return 'Adequate'
     else:
         return 'Weak'
 
+_tabix_handles = {}
+
+def _get_tabix(file_path):
+    """Returns a TabixFile handle, opened once per process and reused."""
+    handle = _tabix_handles.get(file_path)
+    if handle is None:
+        handle = pysam.TabixFile(file_path)
+        _tabix_handles[file_path] = handle
+    return handle
+
+@lru_cache(maxsize=1 << 20)
 def get_score(chrom, pos, file_path):
     try:
-        with pysam.TabixFile(file_path) as tabix_file:  
-            records = tabix_file.fetch(chrom, pos - 1, pos)
-            for record in records:
-                return record.split('\t')[-1]
-            return None
+        tabix_file = _get_tabix(file_path)
+        records = tabix_file.fetch(chrom, pos - 1, pos)
+        for record in records:
+            return record.split('\t')[-1]
+        return None
     except OSError as e:
         print(f"OSError accessing file: {e}")
         return None
@@ -118,11 +149,32 @@ def get_score(chrom, pos, file_path):
         print(f"An unexpected error: {e}")
         return None
 
+@lru_cache(maxsize=1 << 20)
+def get_scores(chrom, start_pos, end_pos, file_path):
+    """Returns the scores overlapping the 1-based inclusive range.
+
+    Results are memoized per process: dense inputs hit the same uStart
+    windows repeatedly and skip the tabix fetch entirely."""
+    try:
+        tabix_file = _get_tabix(file_path)
+        return tuple(record.split('\t')[-1] for record in tabix_file.fetch(chrom, start_pos - 1, end_pos))
+    except OSError as e:
+        print(f"OSError accessing file: {e}")
+    except ValueError as e:
+        print(f"ValueError (likely malformed input): {e}")
+    except KeyError as e:
+        print(f"KeyError (likely missing chromosome): {e}")
+    except pysam.utils.SamtoolsError as e:
+        print(f"Pysam/Samtools error: {e}")
+    except Exception as e:
+        print(f"An unexpected error: {e}")
+    return ()
+
 def uStart_gain(relativePosition, mutatedSequence, startPOS, STRAND, exons, CHR, data_dir):
     """Annotates created uORFs (uStart gain)."""
-    uORF_START = relativePosition - 2
-    while mutatedSequence[uORF_START: uORF_START + 3] != 'ATG':
-        uORF_START += 1
+    # The caller guarantees the window contains an ATG; find() locates it at
+    # memchr speed instead of a per-character slice-compare loop.
+    uORF_START = mutatedSequence.find('ATG', max(relativePosition - 2, 0))
     uORF_END = uORF_START + 3
     while mutatedSequence[uORF_END: uORF_END + 3] not in STOP_CODONS and uORF_END < len(mutatedSequence):
         uORF_END += 3
@@ -138,19 +190,12 @@ def uStart_gain(relativePosition, mutatedSequence, startPOS, STRAND, exons, CHR,
         pos1, pos2, pos3 = uORF_START_GENOMIC, uORF_START_GENOMIC + 1, uORF_START_GENOMIC + 2
     else:
         pos1, pos2, pos3 = uORF_START_GENOMIC, uORF_START_GENOMIC - 1, uORF_START_GENOMIC - 2
-    phyloP_scores = [
-        get_score(CHR, pos1, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phyloP100way', f"{CHR}.bed.gz")),
-        get_score(CHR, pos2, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phyloP100way', f"{CHR}.bed.gz")),
-        get_score(CHR, pos3, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phyloP100way', f"{CHR}.bed.gz"))
-    ]
-    phyloP_scores = [float(score) for score in phyloP_scores if score and is_valid_number(score)]
+    lo, hi = (pos1, pos3) if STRAND == '+' else (pos3, pos1)
+    phyloP_scores = parse_scores(get_scores(
+        CHR, lo, hi, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phyloP100way', f"{CHR}.bed.gz")))
     mean_phylop = sum(phyloP_scores) / len(phyloP_scores) if phyloP_scores else "NA"
-    phastCons_scores = [
-        get_score(CHR, pos1, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phastCons100way', f"{CHR}.bed.gz")),
-        get_score(CHR, pos2, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phastCons100way', f"{CHR}.bed.gz")),
-        get_score(CHR, pos3, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phastCons100way', f"{CHR}.bed.gz"))
-    ]
-    phastCons_scores = [float(score) for score in phastCons_scores if score and is_valid_number(score)]
+    phastCons_scores = parse_scores(get_scores(
+        CHR, lo, hi, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phastCons100way', f"{CHR}.bed.gz")))
     mean_phastcons = sum(phastCons_scores) / len(phastCons_scores) if phastCons_scores else "NA"
     uORF_END_GENOMIC = calculate_genomic_position_from_five_cap(exons, STRAND, uORF_END)
     return [
@@ -169,12 +214,11 @@ def process_variant(variant, utrs_by_chromosome, uorfs_by_transcript, data_dir):
     chromosome_utrs = utrs_by_chromosome.get(CHR, [])
     result = []
     for UTR in chromosome_utrs:
-        CSQ = [[], []]
-        uORFAnnotations = []
-        if UTR[0] != CHR or not (int(UTR[1])-3 <= POS <= int(UTR[2])+3):
+        annotations = []
+        if UTR[0] != CHR or not (UTR[1]-3 <= POS <= UTR[2]+3):
             continue
         status = 'out'
-        exons = ast.literal_eval(UTR[13])
+        exons = UTR[13]
         for exon in exons:
             if exon[0] <= POS <= exon[1] and exon[0] <= POS + len(REF) - 1 <= exon[1]:
                 status = 'in'
@@ -187,8 +231,8 @@ def process_variant(variant, utrs_by_chromosome, uorfs_by_transcript, data_dir):
             relativePosition = calculate_distance_from_five_cap(exons, UTR[3], POS + len(REF) - 1)
         wtSEQ = UTR[12]
         mutatedSequence = wtSEQ[:relativePosition] + (ALT if UTR[3] == '+' else rev_seq(ALT)) + wtSEQ[relativePosition+len(REF):]
-        startPOS = calculate_distance_from_five_cap(exons, UTR[3], int(UTR[2])) if UTR[3] == '+' \
-            else calculate_distance_from_five_cap(exons, UTR[3], int(UTR[1]))
+        startPOS = calculate_distance_from_five_cap(exons, UTR[3], UTR[2]) if UTR[3] == '+' \
+            else calculate_distance_from_five_cap(exons, UTR[3], UTR[1])
         startPOS += len(ALT) - len(REF)
         if 'ATG' != mutatedSequence[startPOS:startPOS+3]:
             continue
@@ -197,30 +241,26 @@ def process_variant(variant, utrs_by_chromosome, uorfs_by_transcript, data_dir):
             if UTR[10][-2] != newKOZAK[-2] or UTR[10][1] != newKOZAK[1] or UTR[10][3] != newKOZAK[3]:
                 newKOZAK_STRENGTH = calculate_kozak_strength(newKOZAK)
                 newKOZAK_STRENGTH = UTR[10] if newKOZAK_STRENGTH == '' else newKOZAK_STRENGTH
-                if KOZAK_STRENGTH[newKOZAK_STRENGTH] < KOZAK_STRENGTH[UTR[11]]:
-                    CSQ[0].append('mKozak')
-                    CSQ[1].append('decreased')
-                    uORFAnnotations.append([''] * 15)
-                if KOZAK_STRENGTH[newKOZAK_STRENGTH] > KOZAK_STRENGTH[UTR[11]]:
-                    CSQ[0].append('mKozak')
-                    CSQ[1].append('increased')
-                    uORFAnnotations.append([''] * 15)
-        if 'ATG' in mutatedSequence[relativePosition-2: relativePosition+len(ALT)+2] and 'ATG' not in wtSEQ[relativePosition-2: relativePosition+len(REF)+2]:
-            CSQ[0].append('uStart_gain')
+                new_rank = KOZAK_STRENGTH[newKOZAK_STRENGTH]
+                wt_rank = KOZAK_STRENGTH[UTR[11]]
+                if new_rank < wt_rank:
+                    annotations.append(('mKozak', 'decreased', [''] * 15))
+                if new_rank > wt_rank:
+                    annotations.append(('mKozak', 'increased', [''] * 15))
+        if relativePosition >= 2 and mutatedSequence.find('ATG', relativePosition-2, relativePosition+len(ALT)+2) != -1 \
+                and wtSEQ.find('ATG', relativePosition-2, relativePosition+len(REF)+2) == -1:
             Anno = uStart_gain(relativePosition, mutatedSequence, startPOS, UTR[3], exons, CHR, data_dir)
-            uORFAnnotations.append(Anno)
-            CSQ[1].append('N-terminal extension' if uORFAnnotations[-1][6] == 'N-terminal extension' else 'decreased')
-        elif relativePosition < 2 and 'ATG' in mutatedSequence[: relativePosition+len(ALT)+2] and 'ATG' not in wtSEQ[: relativePosition+len(REF)+2]:
-            CSQ[0].append('uStart_gain')
+            annotations.append(('uStart_gain', 'N-terminal extension' if Anno[6] == 'N-terminal extension' else 'decreased', Anno))
+        elif relativePosition < 2 and mutatedSequence.find('ATG', 0, relativePosition+len(ALT)+2) != -1 \
+                and wtSEQ.find('ATG', 0, relativePosition+len(REF)+2) == -1:
             Anno = uStart_gain(relativePosition, mutatedSequence, startPOS, UTR[3], exons, CHR, data_dir)
-            uORFAnnotations.append(Anno)
-            CSQ[1].append('N-terminal extension' if uORFAnnotations[-1][6] == 'N-terminal extension' else 'decreased')
+            annotations.append(('uStart_gain', 'N-terminal extension' if Anno[6] == 'N-terminal extension' else 'decreased', Anno))
         if float(UTR[14]) != 0:
             transcript_ids = UTR[6]
             transcript_uorfs = uorfs_by_transcript.get(transcript_ids,[])
             for uORF in transcript_uorfs:
-                uSTART = int(uORF[8]) - int(uORF[17])
-                uSTOP = uSTART + int(uORF[23]) -3
+                uSTART = uORF[8] - uORF[17]
+                uSTOP = uSTART + uORF[23] -3
                 if uSTOP >= relativePosition and len(REF) < len(ALT):
                     if uSTART >= relativePosition:
                         uSTART += len(ALT) -1
@@ -233,10 +273,7 @@ def process_variant(variant, utrs_by_chromosome, uorfs_by_transcript, data_dir):
                 if (uSTART-6 <= relativePosition <= uSTOP+2) or (relativePosition <= uSTART <= relativePosition + len(REF)):
                     # uStart loss & uKozak
                     if mutatedSequence[uSTART : uSTART +3] != uORF[18] and mutatedSequence[uSTART : uSTART +3] != 'ATG':
-                        CSQ[0].extend(['uStart_loss'])
-                        CSQ[1].extend(['increased'])
-                        Anno = uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]
-                        uORFAnnotations += [Anno]
+                        annotations.append(('uStart_loss', 'increased', uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]))
                         continue
                     # scan frame for STOP then uStop gain & uStop loss
                     codon = uSTART
@@ -245,62 +282,44 @@ def process_variant(variant, utrs_by_chromosome, uorfs_by_transcript, data_dir):
                     NewUstopCodon = mutatedSequence[codon : codon+3]
                     if codon < uSTOP and codon +2 < startPOS:
                         if uORF[20] == 'Overlapping':
-                            CSQ[0].extend(['uStop_gain to Non-Overlapping'])
-                            CSQ[1].extend(['increased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_gain to Non-Overlapping', 'increased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                             continue
                         elif uORF[20] == 'N-terminal extension':
-                            CSQ[0].extend(['uStop_gain to Non-Overlapping'])
-                            CSQ[1].extend(['decreased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_gain to Non-Overlapping', 'decreased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                         elif uORF[20] == 'Non-Overlapping':
-                            CSQ[0].extend(['uStop_gain shorter Non-Overlapping'])
-                            CSQ[1].extend(['increased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_gain shorter Non-Overlapping', 'increased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                             continue
                     elif codon < uSTOP and codon == startPOS and uORF[20] == 'Overlapping':
-                        CSQ[0].extend(['uStop_gain to N-terminal extension'])
-                        CSQ[1].extend(['N-terminal extension'])
-                        Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19]] + uORF[20:-4] + uORF[-3:]
-                        uORFAnnotations += [Anno]
+                        annotations.append(('uStop_gain to N-terminal extension', 'N-terminal extension',
+                                            uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19]] + uORF[20:-4] + uORF[-3:]))
                     elif codon > uSTOP and uORF[20] != 'Overlapping':
                         if codon == startPOS and uORF[20] != 'N-terminal extension':
-                            CSQ[0].extend(['uStop_loss to N-terminal extension'])
-                            CSQ[1].extend(['N-terminal extension'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_loss to N-terminal extension', 'N-terminal extension',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                         elif codon > startPOS:
-                            CSQ[0].extend(['uStop_loss to Overlapping'])
-                            CSQ[1].extend(['decreased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_loss to Overlapping', 'decreased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                         elif uORF[20] == 'Non-Overlapping':
-                            CSQ[0].extend(['uStop_loss longer Non-Overlapping'])
-                            CSQ[1].extend(['decreased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_loss longer Non-Overlapping', 'decreased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                     if uSTART -1 == relativePosition or relativePosition == uSTART -3 or relativePosition == uSTART +3:
                         newKOZAK = mutatedSequence[uSTART -4 :uSTART +5]
                         # compare WT kozak strength with the Mutated kozak strength
                         newKOZAK_STRENGTH = calculate_kozak_strength(newKOZAK)
                         newKOZAK_STRENGTH = uORF[22] if newKOZAK_STRENGTH == '' else newKOZAK_STRENGTH
-                        if KOZAK_STRENGTH[newKOZAK_STRENGTH] < KOZAK_STRENGTH[uORF[22]]:
-                            CSQ[0].extend(['uKozak'])
-                            CSQ[1].extend(['increased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
-                        elif KOZAK_STRENGTH[newKOZAK_STRENGTH] > KOZAK_STRENGTH[uORF[22]]:
-                            CSQ[0].extend(['uKozak'])
-                            CSQ[1].extend(['decreased'])
-                            Anno= uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
-        count = 0
-        for hit in CSQ[0]:
-            result.append(variant + [hit, CSQ[1][count]] + UTR[1:12] + UTR[14:] + uORFAnnotations[count])
-            count += 1
+                        new_rank = KOZAK_STRENGTH[newKOZAK_STRENGTH]
+                        uORF_rank = KOZAK_STRENGTH[uORF[22]]
+                        if new_rank < uORF_rank:
+                            annotations.append(('uKozak', 'increased', uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]))
+                        elif new_rank > uORF_rank:
+                            annotations.append(('uKozak', 'decreased', uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]))
+        if annotations:
+            UTR_fields = UTR[1:12] + UTR[14:]
+            for csq, translation, anno in annotations:
+                result.append(variant + [csq, translation] + UTR_fields + anno)
     return result
 
 def process_variants(input_variants, output_file_path, data_dir='~/.5ULTRA/data'):
@@ -312,10 +331,20 @@ def process_variants(input_variants, output_file_path, data_dir='~/.5ULTRA/data'
     utrs_by_chromosome = defaultdict(list)
     uorfs_by_transcript = defaultdict(list)
     for UTR in UTRs[1:]:
+        # Cast the 5'UTR boundaries and parse the exon list once at load time
+        # instead of per variant-UTR pair.
+        UTR[1] = int(UTR[1])
+        UTR[2] = int(UTR[2])
+        UTR[13] = sorted(parse_exons(UTR[13]))
         CHR = UTR[0]
         utrs_by_chromosome[CHR].append(UTR)
     UTR_headers = UTRs[0]
     for uORF in uORFs[1:]:
+        # Cast the uORF coordinates once at load time; the inner uORF loop
+        # re-derived them from strings for every variant.
+        uORF[8] = int(uORF[8])
+        uORF[17] = int(uORF[17])
+        uORF[23] = int(uORF[23])
         TRANSCRIPTS = uORF[5]
         uorfs_by_transcript[TRANSCRIPTS].append(uORF)
     uORF_headers = uORFs[0]
@@ -1,12 +1,21 @@
 import bisect
 import gzip
+import io
 import logging
 import argparse
+import shutil
+import subprocess
 import sys
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Absolute path of the external decompressor, resolved once at import time.
+# bgzip is preferred for BGZF-compressed VCFs; plain gzip handles both. The
+# absolute path (with default close_fds and no preexec_fn) keeps Popen on
+# CPython's posix_spawn fast path, avoiding a fork of the parent.
+_DECOMPRESSOR = shutil.which('bgzip') or shutil.which('gzip')
+
 
 def read_bed_file(bed_file_path):
     """
@@ -33,33 +42,48 @@ def read_bed_file(bed_file_path):
     return bed_by_chrom
 
 
-def batch_process_file(input_file_path, bed_by_chrom, sep, output_file):
+def iter_matching_lines(input_file_path, bed_by_chrom, sep):
     """
-    Processes the input variant file and filters variants based on bed regions.
-    Writes matched lines directly to the output file.
+    Yields the header line and every variant line that falls in a bed region,
+    stripped of trailing whitespace, so callers can stream the filtered
+    variants straight into the next stage without an intermediate file.
     """
-    open_func = gzip.open if input_file_path.endswith('.gz') else open
-    header_found = False
+    proc = None
     try:
-        with open_func(input_file_path, 'rt', encoding='utf-8-sig') as f_in:
-            for line in f_in:
+        # Detect gzip by the magic bytes rather than the filename, so
+        # compressed files without a .gz suffix (and plain files with one)
+        # are handled correctly; peek() keeps the same handle usable.
+        raw = open(input_file_path, 'rb')
+        if raw.peek(2)[:2] == b'\x1f\x8b':
+            if _DECOMPRESSOR is not None:
+                # Inflate through an external bgzip/gzip process so
+                # decompression runs in optimized C concurrently with the
+                # Python-side filtering.
+                raw.close()
+                proc = subprocess.Popen([_DECOMPRESSOR, '-dc', input_file_path],
+                                        stdout=subprocess.PIPE)
+                f_in = io.TextIOWrapper(proc.stdout, encoding='utf-8-sig')
+            else:
+                f_in = io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding='utf-8-sig')
+        else:
+            f_in = io.TextIOWrapper(raw, encoding='utf-8-sig')
+        with f_in:
+            lines = iter(f_in)
+            # Header phase: metadata ('##') only ever precedes the header, so
+            # it is skipped here once and the data loop below runs without
+            # the per-line metadata/header checks.
+            for line in lines:
                 clean_line = line.strip()
-                if not clean_line:
+                if not clean_line or clean_line.startswith('##'):
                     continue
-                # Skip VCF Metadata
-                if clean_line.startswith('##'):
+                # Identify Header (Line starting with #CHROM or first
+                # non-comment line; TSV headers carry no # prefix)
+                yield clean_line
+                break
+            for line in lines:
+                clean_line = line.strip()
+                if not clean_line:
                     continue
-                # Identify Header (Line starting with #CHROM or first non-comment line)
-                if not header_found:
-                    if clean_line.startswith('#'):
-                        output_file.write(clean_line + '\n')
-                        header_found = True
-                        continue
-                    else:
-                        # For TSV files without # prefix
-                        output_file.write(clean_line + '\n')
-                        header_found = True
-                        continue
                 try:
                     parts = clean_line.split(sep)
                     if len(parts) < 2:
@@ -75,14 +99,49 @@ def batch_process_file(input_file_path, bed_by_chrom, sep, output_file):
                         if index > 0:
                             start, end = regions[index - 1]
                             if start - 4 <= pos_int <= end + 4:
-                                output_file.write(clean_line + '\n')      
+                                yield clean_line
                 except (ValueError, IndexError):
                     # Only log if it's not a header-looking line we missed
                     if not clean_line.startswith('#'):
                         logging.warning(f"Skipping malformed data line: {clean_line[:50]}...")
+        if proc is not None and proc.wait() != 0:
+            # A corrupt or truncated gzip kills the decompressor mid-stream;
+            # the pipe then just ends, so without this check a partial input
+            # would pass as a complete one. gzip.open raises EOFError in the
+            # same situation, and this mirrors that hard failure. Only fully
+            # consumed streams reach here — consumers that stop early are
+            # reaped in the finally below, where a non-zero exit from the
+            # broken pipe is expected and deliberately ignored.
+            raise OSError(f"'{_DECOMPRESSOR}' exited with status {proc.returncode} "
+                          f"while decompressing '{input_file_path}'")
     except Exception as e:
         logging.error(f"Error reading input file: {e}")
         sys.exit(1)
+    finally:
+        if proc is not None:
+            proc.wait()
+
+
+def iter_filtered_lines(input_file_path, bed_file_path):
+    """
+    Yields the filtered variant lines for an input file without writing them
+    anywhere, for callers that consume the filter output directly.
+    """
+    if input_file_path.endswith('.csv'):
+        sep = ','
+    else:
+        sep = '\t'
+    bed_by_chrom = read_bed_file(bed_file_path)
+    yield from iter_matching_lines(input_file_path, bed_by_chrom, sep)
+
+
+def batch_process_file(input_file_path, bed_by_chrom, sep, output_file):
+    """
+    Processes the input variant file and filters variants based on bed regions.
+    Writes matched lines directly to the output file.
+    """
+    for line in iter_matching_lines(input_file_path, bed_by_chrom, sep):
+        output_file.write(line + '\n')
 
 
 def filter_input(input_file_path, bed_file_path, output_file_path=None):
@@ -1,7 +1,18 @@
+import gzip
+import multiprocessing
 import pysam
 import os
 import sys
 
+def open_text(path, mode):
+    """Opens a text file, transparently gzip-compressing `.gz` paths.
+
+    Intermediates are compressed at level 1: a small CPU cost for a large
+    reduction in bytes moved between stages."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=1)
+    return open(path, mode)
+
 def parse_spliceai_info(info_field):
     """
     Extracts the SpliceAI annotation from the INFO field of a VCF record.
@@ -49,18 +60,64 @@ def process_variant_spliceai_1(chrom, pos, ref, alt, snv_vcf):
 
     return spliceai_results
 
-def process_spliceai_1(input_file, output_file, data_dir='~/.5ULTRA/data', cutoff=0.2):
+def _annotate_line(line, snv_vcf, cutoff):
+    """
+    Annotates a single input line, returning the formatted output lines.
+    """
+    fields = line.split('\t')
+    if len(fields) < 5:
+        return []  # Skip incomplete lines
+
+    chrom = fields[0].lstrip('chr')
+    pos = int(fields[1])
+    ref = fields[3]
+    alt = fields[4]
+
+    # Process variant
+    spliceai_annotations = process_variant_spliceai_1(chrom, pos, ref, alt, snv_vcf)
+
+    # Process each SpliceAI annotation
+    out_lines = []
+    for annotation in spliceai_annotations:
+        entries = annotation.split(',')
+        for entry in entries:
+            try:
+                allele, gene, score1, score2, score3, score4, pos1, pos2, pos3, pos4 = entry.split('|')
+                scores = [float(score1), float(score2), float(score3), float(score4)]
+                positions = [pos1, pos2, pos3, pos4]
+                if any(score > cutoff for score in scores):
+                    formatted_scores = '|'.join([gene] + [f"{score:.2f}" for score in scores] + positions)
+                    out_lines.append(f"{line}\t{formatted_scores}\n")
+            except ValueError:
+                continue  # Skip entries with invalid format
+    return out_lines
+
+# Worker state for the multiprocessing pool. pysam handles cannot cross
+# process boundaries, so each worker opens its own TabixFile in _init_worker.
+_worker_snv_vcf = None
+_worker_cutoff = None
+
+def _init_worker(snv_vcf_path, cutoff):
+    global _worker_snv_vcf, _worker_cutoff
+    _worker_snv_vcf = pysam.TabixFile(snv_vcf_path)
+    _worker_cutoff = cutoff
+
+def _annotate_line_worker(line):
+    return _annotate_line(line, _worker_snv_vcf, _worker_cutoff)
+
+def process_spliceai_1(input_file, output_file, data_dir='~/.5ULTRA/data', cutoff=0.2, threads=1):
     """
     Processes an input file to add SpliceAI annotations.
 
     Parameters:
-    - input_file: Path to the input file.
-    - output_file: Path to the output file.
+    - input_file: Path to the input file, or '-' to read from stdin.
+    - output_file: Path to the output file, or '-' to write to stdout.
     - data_dir: Directory containing SpliceAI data files.
     - cutoff: Score cutoff for SpliceAI annotations.
+    - threads: Number of worker processes for the annotation loop.
     """
     # Verify if input file exists
-    if not os.path.isfile(input_file):
+    if input_file != '-' and not os.path.isfile(input_file):
         raise FileNotFoundError(f"Input file '{input_file}' not found.")
 
     # Paths to SpliceAI VCF files
@@ -72,41 +129,35 @@ def process_spliceai_1(input_file, output_file, data_dir='~/.5ULTRA/data', cutof
     # Open VCF files using pysam
     snv_vcf = pysam.TabixFile(snv_vcf_path)
 
-    with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
+    # '-' means the stage runs inside a shell pipeline on stdin/stdout; the
+    # standard streams stay open for the caller, so only real files are
+    # closed below. This stage reads its input in a single pass, so it
+    # streams either way.
+    infile = sys.stdin if input_file == '-' else open_text(input_file, 'rt')
+    outfile = sys.stdout if output_file == '-' else open_text(output_file, 'wt')
+    try:
         # Write the header line to the output file
         header = infile.readline().strip('\r\n')
         outfile.write(f"{header}\tSpliceAI\n")
 
         # Process each line in the input file
-        for line in infile:
-            line = line.strip('\r\n')
-            if not line:
-                continue
-            fields = line.split('\t')
-            if len(fields) < 5:
-                continue  # Skip incomplete lines
-
-            chrom = fields[0].lstrip('chr')
-            pos = int(fields[1])
-            ref = fields[3]
-            alt = fields[4]
-
-            # Process variant
-            spliceai_annotations = process_variant_spliceai_1(chrom, pos, ref, alt, snv_vcf)
-
-            # Process each SpliceAI annotation
-            for annotation in spliceai_annotations:
-                entries = annotation.split(',')
-                for entry in entries:
-                    try:
-                        allele, gene, score1, score2, score3, score4, pos1, pos2, pos3, pos4 = entry.split('|')
-                        scores = [float(score1), float(score2), float(score3), float(score4)]
-                        positions = [pos1, pos2, pos3, pos4]
-                        if any(score > cutoff for score in scores):
-                            formatted_scores = '|'.join([gene] + [f"{score:.2f}" for score in scores] + positions)
-                            outfile.write(f"{line}\t{formatted_scores}\n")
-                    except ValueError:
-                        continue  # Skip entries with invalid format
+        lines = (line.strip('\r\n') for line in infile)
+        lines = (line for line in lines if line)
+        if threads > 1:
+            # Each line is annotated independently; ordered imap keeps the
+            # output in input order while the tabix queries fan out.
+            with multiprocessing.Pool(threads, initializer=_init_worker,
+                                      initargs=(snv_vcf_path, cutoff)) as pool:
+                for out_lines in pool.imap(_annotate_line_worker, lines, chunksize=512):
+                    outfile.writelines(out_lines)
+        else:
+            for line in lines:
+                outfile.writelines(_annotate_line(line, snv_vcf, cutoff))
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
 
     # Close VCF files
     snv_vcf.close()
@@ -115,15 +166,16 @@ def process_spliceai_1(input_file, output_file, data_dir='~/.5ULTRA/data', cutof
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='Process SpliceAI annotations.')
-    parser.add_argument('input_file', type=str, help='Path to the input file.')
-    parser.add_argument('output_file', type=str, help='Path to the output file.')
+    parser.add_argument('input_file', type=str, help="Path to the input file, or '-' for stdin.")
+    parser.add_argument('output_file', type=str, help="Path to the output file, or '-' for stdout.")
     parser.add_argument('--data-dir', type=str, default=os.path.join(os.path.expanduser("~"), ".5ULTRA", "data"), help='Path to the data directory.')
     parser.add_argument('--cutoff', type=float, default=0.2, help='Score cutoff for SpliceAI annotations.')
+    parser.add_argument('--threads', type=int, default=1, help='Number of worker processes.')
     args = parser.parse_args()
     try:
-        process_spliceai_1(args.input_file, args.output_file, data_dir=args.data_dir, cutoff=args.cutoff)
+        process_spliceai_1(args.input_file, args.output_file, data_dir=args.data_dir, cutoff=args.cutoff, threads=args.threads)
     except Exception as e:
-        print(f"An error occurred: {e}")
+        print(f"An error occurred: {e}", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,19 +1,43 @@
 import csv
+import gzip
 import sys
 import os
+import multiprocessing
 from collections import defaultdict
-import ast
 
 # Constants
-BASE_PAIRING = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G', 'N': 'N', '*': '*'}
+_COMPLEMENT = str.maketrans('ATGCN*', 'TACGN*')
+_NO_INTRONS = ({}, {})
 
 def rev_seq(fwd_seq):
-    """Reverse complements a DNA sequence based on the BASE_PAIRING dictionary."""
-    return ''.join(BASE_PAIRING.get(nuc, 'N') for nuc in reversed(fwd_seq))
+    """Reverse complements a DNA sequence."""
+    return fwd_seq.translate(_COMPLEMENT)[::-1]
+
+def parse_exons(field):
+    """Parses a `"[(start, end), ...]"` exon field into a list of int pairs.
+
+    The field is always a literal list of integer tuples, so a split-based
+    parser is used instead of `ast.literal_eval`."""
+    exons = []
+    for chunk in field.strip('[] ').split('),'):
+        start, end = chunk.strip(' ()').split(',')
+        exons.append((int(start), int(end)))
+    return exons
+
+def open_text(path, mode):
+    """Opens a text file, transparently gzip-compressing `.gz` paths.
+
+    Intermediates are compressed at level 1: a small CPU cost for a large
+    reduction in bytes moved between stages."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=1)
+    return open(path, mode)
 
 def load_tsv_data(file_path):
-    """Loads TSV data from a file and returns a list of rows."""
-    data = []
+    """Yields TSV rows from a file one at a time.
+
+    Streaming keeps only the indexed structures resident instead of a second
+    full copy of the table."""
     try:
         max_int = sys.maxsize
         while True:
@@ -22,22 +46,19 @@ def load_tsv_data(file_path):
                 break
             except OverflowError:
                 max_int = int(max_int / 10)
-        with open(file_path, 'r') as file:
-            csv_reader = csv.reader(file, delimiter='\t')
-            data = list(csv_reader)
+        with open_text(file_path, 'rt') as file:
+            yield from csv.reader(file, delimiter='\t')
     except FileNotFoundError:
-        print(f"File not found: {file_path}")
+        print(f"File not found: {file_path}", file=sys.stderr)
     except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
-    return data
+        print(f"Error reading file {file_path}: {e}", file=sys.stderr)
 
 def calculate_distance_from_five_cap(exons, strand, position):
-    """Calculates distance from the 5' cap in a list of exons."""
+    """Calculates distance from the 5' cap in a list of exons.
+
+    Assumes `exons` is already sorted by start position."""
     distance = 0
-    sorted_exons = sorted(exons, key=lambda x: x[0])
-    if strand == '-':
-        sorted_exons = list(reversed(sorted_exons))
-    for exon_start, exon_end in sorted_exons:
+    for exon_start, exon_end in (exons if strand == '+' else reversed(exons)):
         if (strand == '+' and exon_end < position) or (strand == '-' and exon_start > position):
             distance += exon_end - exon_start + 1
         elif (strand == '+' and exon_start <= position <= exon_end) or (strand == '-' and exon_end >= position >= exon_start):
@@ -47,68 +68,81 @@ def calculate_distance_from_five_cap(exons, strand, position):
 
 def process_variant_spliceai_2(variant, UTRs_by_gene, Introns_by_transcript, cutoff):
     """Processes a single variant and returns the processed result."""
+    SPLICEAI = variant[-1]
+    try:
+        GENE, AG_score, AL_score, DG_score, DL_score, AG_POS, AL_POS, DG_POS, DL_POS = SPLICEAI.split('|')
+    except ValueError:
+        # If SPLICEAI field does not have expected format, skip processing
+        return []
+    gene_UTRs = UTRs_by_gene.get(GENE, [])
+    if not gene_UTRs:
+        # Most variants hit genes without an annotated 5'UTR; skip the score
+        # and position coercions entirely for those.
+        return []
     CHR = variant[0] if 'chr' in variant[0] else 'chr' + variant[0]
     POS = int(variant[1])
     REF = variant[3]
     ALT = '' if variant[4] in ('<DEL>', '.') else variant[4]
-    SPLICEAI = variant[-1]
     try:
-        GENE, AG_score, AL_score, DG_score, DL_score, AG_POS, AL_POS, DG_POS, DL_POS = SPLICEAI.split('|')
         AG_POS, AL_POS, DG_POS, DL_POS = int(AG_POS) + POS, int(AL_POS) + POS, int(DG_POS) + POS, int(DL_POS) + POS
         AG_score, AL_score, DG_score, DL_score = map(float, (AG_score, AL_score, DG_score, DL_score))
     except ValueError:
-        # If SPLICEAI field does not have expected format, skip processing
         return []
-    gene_UTRs = UTRs_by_gene.get(GENE, [])
+    if AG_score < cutoff and DG_score < cutoff:
+        # Neither gain branch can fire below the cutoff, so skip the UTR walk.
+        return []
+    true_variant = f'{CHR}_{POS}_{variant[2]}_{REF}_{ALT}'
+    variant_tail = variant[5:]
     result = []
     for UTR in gene_UTRs:
-        if CHR != UTR[0] or int(UTR[1]) > POS or int(UTR[2]) < POS:
+        if UTR[1] > POS:
+            # UTRs are sorted by start, so no later one can contain POS.
+            break
+        if CHR != UTR[0] or UTR[2] < POS:
             continue
-        exons = ast.literal_eval(UTR[13])
+        exons, exon_positions, prev_end_by_start = UTR[13]
         strand = UTR[3]
         if strand == '+':
             # Process AG_score
             if AG_score >= cutoff:
-                if all(AL_POS not in range(t[0], t[1]+1) for t in exons):
+                if AL_POS not in exon_positions:
                     continue
                 if AG_POS < AL_POS:
                     variant_type = 'AG_insertion_+'
-                    transcript_INTRONs = Introns_by_transcript.get(UTR[6], [])
-                    for intron in transcript_INTRONs:
-                        if AL_POS == int(intron[2]):
-                            newPOS = int(intron[1])
-                            newREF = intron[11][0]
-                            newALT = intron[11][0] + intron[11][AG_POS - AL_POS -1 : -1]
-                            if AG_POS <= POS < AL_POS and AG_POS < POS + len(REF) -1 <= AL_POS:
-                                newALT = newALT[:POS - AG_POS +1] + ALT + newALT[POS - AG_POS + len(REF) +1 :]
-                            result.append([CHR, newPOS, variant[2], newREF, newALT] + variant[5:] +
-                                          [UTR[6], f'{CHR}_{POS}_{variant[2]}_{REF}_{ALT}', variant_type])
+                    introns_by_end = Introns_by_transcript.get(UTR[6], _NO_INTRONS)[1]
+                    for intron in introns_by_end.get(AL_POS, ()):
+                        newPOS = intron[1]
+                        newREF = intron[11][0]
+                        newALT = intron[11][0] + intron[11][AG_POS - AL_POS -1 : -1]
+                        if AG_POS <= POS < AL_POS and AG_POS < POS + len(REF) -1 <= AL_POS:
+                            newALT = newALT[:POS - AG_POS +1] + ALT + newALT[POS - AG_POS + len(REF) +1 :]
+                        result.append([CHR, newPOS, variant[2], newREF, newALT, *variant_tail,
+                                       UTR[6], true_variant, variant_type])
                 elif AG_POS > AL_POS:
                     variant_type = 'AG_deletion_+'
                     new = calculate_distance_from_five_cap(exons, strand, AG_POS)
                     old = calculate_distance_from_five_cap(exons, strand, AL_POS)
-                    newPOS = next((exons[i-1][1] for i in range(1, len(exons)) if exons[i][0] == AL_POS), None)
+                    newPOS = prev_end_by_start.get(AL_POS)
                     if newPOS:
                         newREF = UTR[12][old -1 : new]
                         newALT = UTR[12][old -1]
-                        result.append([CHR, newPOS, variant[2], newREF, newALT] + variant[5:] +
-                                      [UTR[6], f'{CHR}_{POS}_{variant[2]}_{REF}_{ALT}', variant_type])
+                        result.append([CHR, newPOS, variant[2], newREF, newALT, *variant_tail,
+                                           UTR[6], true_variant, variant_type])
             # Process DG_score
             if DG_score >= cutoff:
-                if all(DL_POS not in range(t[0], t[1]+1) for t in exons):
+                if DL_POS not in exon_positions:
                     continue
                 if DG_POS > DL_POS:
                     variant_type = 'DG_insertion_+'
-                    transcript_INTRONs = Introns_by_transcript.get(UTR[6], [])
-                    for intron in transcript_INTRONs:
-                        if DL_POS == int(intron[1]):
-                            newPOS = int(intron[1])
-                            newREF = intron[11][0]
-                            newALT = intron[11][: DG_POS - DL_POS +1]
-                            if DL_POS <= POS <= DG_POS and DL_POS <= POS + len(REF) -1 <= DG_POS:
-                                newALT = newALT[: POS - DL_POS ] + ALT + newALT[POS - DL_POS + len(REF) :]
-                            result.append([CHR, newPOS, variant[2], newREF, newALT] + variant[5:] +
-                                          [UTR[6], f'{CHR}_{POS}_{variant[2]}_{REF}_{ALT}', variant_type])
+                    introns_by_start = Introns_by_transcript.get(UTR[6], _NO_INTRONS)[0]
+                    for intron in introns_by_start.get(DL_POS, ()):
+                        newPOS = intron[1]
+                        newREF = intron[11][0]
+                        newALT = intron[11][: DG_POS - DL_POS +1]
+                        if DL_POS <= POS <= DG_POS and DL_POS <= POS + len(REF) -1 <= DG_POS:
+                            newALT = newALT[: POS - DL_POS ] + ALT + newALT[POS - DL_POS + len(REF) :]
+                        result.append([CHR, newPOS, variant[2], newREF, newALT, *variant_tail,
+                                       UTR[6], true_variant, variant_type])
                 elif DG_POS < DL_POS:
                     variant_type = 'DG_deletion_+'
                     new = calculate_distance_from_five_cap(exons, strand, DG_POS)
@@ -116,24 +150,23 @@ def process_variant_spliceai_2(variant, UTRs_by_gene, Introns_by_transcript, cut
                     newPOS = DG_POS
                     newREF = UTR[12][new : old +1]
                     newALT = UTR[12][new]
-                    result.append([CHR, newPOS, variant[2], newREF, newALT] + variant[5:] +
-                                  [UTR[6], f'{CHR}_{POS}_{variant[2]}_{REF}_{ALT}', variant_type])
+                    result.append([CHR, newPOS, variant[2], newREF, newALT, *variant_tail,
+                                           UTR[6], true_variant, variant_type])
         else:  # strand == '-'
             if AG_score >= cutoff:
-                if all(AL_POS not in range(t[0], t[1]+1) for t in exons): 
+                if AL_POS not in exon_positions:
                     continue
                 if AG_POS > AL_POS: 
                     variant_type = 'AG_insertion_-'
-                    transcript_INTRONs = Introns_by_transcript.get(UTR[6], [])
-                    for intron in transcript_INTRONs:
-                        if AL_POS == int(intron[1]): 
-                            newPOS = int(intron[1]) 
-                            newREF = rev_seq(intron[11][-1]) 
-                            newALT = rev_seq(intron[11][AL_POS - AG_POS -1: ])
-                            if AL_POS <= POS <= AG_POS and AL_POS < POS + len(REF) - 1 <= AG_POS: 
-                                newALT = newALT[: POS - AL_POS] + ALT + newALT[ POS - AG_POS + len(REF) -1 :]
-                            result.append([CHR, newPOS, variant[2], newREF, newALT] + variant[5:] +
-                                          [UTR[6], f'{CHR}_{POS}_{variant[2]}_{REF}_{ALT}', variant_type])
+                    introns_by_start = Introns_by_transcript.get(UTR[6], _NO_INTRONS)[0]
+                    for intron in introns_by_start.get(AL_POS, ()):
+                        newPOS = intron[1]
+                        newREF = rev_seq(intron[11][-1]) 
+                        newALT = rev_seq(intron[11][AL_POS - AG_POS -1: ])
+                        if AL_POS <= POS <= AG_POS and AL_POS < POS + len(REF) - 1 <= AG_POS: 
+                            newALT = newALT[: POS - AL_POS] + ALT + newALT[ POS - AG_POS + len(REF) -1 :]
+                        result.append([CHR, newPOS, variant[2], newREF, newALT, *variant_tail,
+                                       UTR[6], true_variant, variant_type])
                 elif AG_POS < AL_POS: 
                     variant_type = 'AG_deletion_-'
                     new = calculate_distance_from_five_cap(exons, strand, AG_POS) 
@@ -141,81 +174,159 @@ def process_variant_spliceai_2(variant, UTRs_by_gene, Introns_by_transcript, cut
                     newPOS = AG_POS
                     newREF = rev_seq(UTR[12][old : new +1]) 
                     newALT = rev_seq(UTR[12][new])
-                    result.append([CHR, newPOS, variant[2], newREF, newALT] + variant[5:] +
-                                      [UTR[6], f'{CHR}_{POS}_{variant[2]}_{REF}_{ALT}', variant_type])
+                    result.append([CHR, newPOS, variant[2], newREF, newALT, *variant_tail,
+                                           UTR[6], true_variant, variant_type])
             if DG_score >= cutoff:
-                if all(DL_POS not in range(t[0], t[1]+1) for t in exons): 
+                if DL_POS not in exon_positions:
                     continue
                 if DG_POS < DL_POS: 
                     variant_type = 'DG_insertion_-'
-                    transcript_INTRONs = Introns_by_transcript.get(UTR[6], [])
-                    for intron in transcript_INTRONs:
-                        if DL_POS == int(intron[2]): 
-                            newPOS = int(intron[1]) 
-                            newREF = rev_seq(intron[11][-1])
-                            newALT = newREF + rev_seq(intron[11][1: DL_POS - DG_POS + 1]) 
-                            if DG_POS <= POS < DL_POS and DG_POS <= POS + len(REF) - 1 < DL_POS: 
-                                newALT = newALT[:POS - DG_POS +1] + ALT + newALT[POS - DG_POS + len(REF) +1:]
-                            result.append([CHR, newPOS, variant[2], newREF, newALT] + variant[5:] +
-                                          [UTR[6], f'{CHR}_{POS}_{variant[2]}_{REF}_{ALT}', variant_type])
+                    introns_by_end = Introns_by_transcript.get(UTR[6], _NO_INTRONS)[1]
+                    for intron in introns_by_end.get(DL_POS, ()):
+                        newPOS = intron[1]
+                        newREF = rev_seq(intron[11][-1])
+                        newALT = newREF + rev_seq(intron[11][1: DL_POS - DG_POS + 1]) 
+                        if DG_POS <= POS < DL_POS and DG_POS <= POS + len(REF) - 1 < DL_POS: 
+                            newALT = newALT[:POS - DG_POS +1] + ALT + newALT[POS - DG_POS + len(REF) +1:]
+                        result.append([CHR, newPOS, variant[2], newREF, newALT, *variant_tail,
+                                       UTR[6], true_variant, variant_type])
                 elif DG_POS > DL_POS:
                     variant_type = 'DG_deletion_-'
                     new = calculate_distance_from_five_cap(exons, strand, DG_POS)
                     old = calculate_distance_from_five_cap(exons, strand, DL_POS)
-                    newPOS = next((exons[i-1][1] for i in range(1, len(exons)) if exons[i][0] == DL_POS), None)
+                    newPOS = prev_end_by_start.get(DL_POS)
                     if newPOS:
                         newALT = rev_seq(UTR[12][old+1])
                         newREF = newALT + rev_seq(UTR[12][new +1: old +1])
-                        result.append([CHR, newPOS, variant[2], newREF, newALT] + variant[5:] +
-                                      [UTR[6], f'{CHR}_{POS}_{variant[2]}_{REF}_{ALT}', variant_type])
+                        result.append([CHR, newPOS, variant[2], newREF, newALT, *variant_tail,
+                                           UTR[6], true_variant, variant_type])
     return result
 
-def process_variants_spliceai_2(input_file, output_file_path, data_dir, cutoff):
-    """Processes all variants and writes the results to the output file."""
+# Worker state for the multiprocessing pool. With the fork start method the
+# parent populates these globals before creating the pool and workers inherit
+# them copy-on-write, so the large lookup dicts are never pickled; elsewhere
+# they are sent once per worker through _init_worker.
+_worker_utrs_by_gene = None
+_worker_introns_by_transcript = None
+_worker_cutoff = None
+
+def _init_worker(utrs_by_gene, introns_by_transcript, cutoff):
+    global _worker_utrs_by_gene, _worker_introns_by_transcript, _worker_cutoff
+    _worker_utrs_by_gene = utrs_by_gene
+    _worker_introns_by_transcript = introns_by_transcript
+    _worker_cutoff = cutoff
+
+def _process_variant_worker(variant):
+    return process_variant_spliceai_2(variant, _worker_utrs_by_gene,
+                                      _worker_introns_by_transcript, _worker_cutoff)
+
+def process_variants_spliceai_2(input_file, output_file_path, data_dir, cutoff, threads=1):
+    """Processes all variants and writes the results to the output file.
+
+    `input_file`/`output_file_path` may be '-' for stdin/stdout, so the stage
+    can sit in a shell pipeline."""
     UTRS_FILE_PATH = os.path.join(os.path.expanduser(data_dir), '5UTRs.tsv')
     INTRONS_FILE_PATH = os.path.join(os.path.expanduser(data_dir), 'Introns.tsv')
+    # stdin cannot be rewound for the gene-collection prepass, so its rows
+    # are materialized; file inputs keep the streaming reader.
+    input_rows = list(csv.reader(sys.stdin, delimiter='\t')) if input_file == '-' else None
+    # First pass over the variants: collect the genes their SpliceAI fields
+    # reference, so only those rows of the UTR table (which carries the full
+    # 5'UTR sequences) are parsed and kept resident.
+    wanted_genes = set()
+    for variant in (input_rows if input_rows is not None else load_tsv_data(input_file)):
+        wanted_genes.add(variant[-1].split('|', 1)[0])
     UTRs = load_tsv_data(UTRS_FILE_PATH)
     Introns = load_tsv_data(INTRONS_FILE_PATH)
-    variants = load_tsv_data(input_file)
+    variants = iter(input_rows) if input_rows is not None else load_tsv_data(input_file)
     UTRs_by_gene = defaultdict(list)
-    Introns_by_transcript = defaultdict(list)
+    Introns_by_transcript = {}
+    kept_transcripts = set()
 
-    # Group UTRs and Introns
-    for UTR in UTRs[1:]:
+    # Group UTRs and Introns straight off the row streams, casting boundaries
+    # and parsing exon lists once at load time instead of per variant-UTR pair.
+    UTRs_header = next(UTRs, [])
+    for UTR in UTRs:
+        if UTR[5] not in wanted_genes:
+            continue
+        kept_transcripts.add(UTR[6])
+        UTR[1] = int(UTR[1])
+        UTR[2] = int(UTR[2])
+        exons = sorted(parse_exons(UTR[13]))
+        # Keep a flat set of exonic positions for O(1) membership tests and
+        # the end of the preceding exon keyed by exon start for the splice
+        # junction lookups, alongside the exon list itself.
+        exon_positions = {p for t in exons for p in range(t[0], t[1] + 1)}
+        prev_end_by_start = {exons[i][0]: exons[i - 1][1] for i in range(1, len(exons))}
+        UTR[13] = (exons, exon_positions, prev_end_by_start)
         GENE = UTR[5]
         UTRs_by_gene[GENE].append(UTR)
-    UTRs_header = UTRs[0]
+    # Sort each gene's transcripts by 5'UTR start so the per-variant scan can
+    # stop at the first UTR starting past the variant position.
+    for gene_UTRs in UTRs_by_gene.values():
+        gene_UTRs.sort(key=lambda UTR: UTR[1])
 
-    for Intron in Introns[1:]:
+    next(Introns, None)
+    for Intron in Introns:
+        if Intron[7] not in kept_transcripts:
+            continue
+        Intron[1] = int(Intron[1])
+        Intron[2] = int(Intron[2])
         TRANSCRIPT = Intron[7]
-        Introns_by_transcript[TRANSCRIPT].append(Intron)
+        # Key each transcript's introns by both splice boundaries so the
+        # per-variant branches look the intron up instead of scanning.
+        by_start, by_end = Introns_by_transcript.setdefault(TRANSCRIPT, ({}, {}))
+        by_start.setdefault(Intron[1], []).append(Intron)
+        by_end.setdefault(Intron[2], []).append(Intron)
 
-    results = []
-    for variant in variants[1:]:
-        if ',' in variant[4]:
-            continue
-        processed_variant = process_variant_spliceai_2(variant, UTRs_by_gene, Introns_by_transcript, cutoff=cutoff)
-        if processed_variant:
-            results.extend(processed_variant)
-    fields = variants[0] + [UTRs_header[6], 'True_variant', 'type']
+    fields = next(variants) + [UTRs_header[6], 'True_variant', 'type']
+    variant_rows = (variant for variant in variants if ',' not in variant[4])
 
-    with open(output_file_path, 'w', newline='') as f:
+    if output_file_path == '-':
+        f = sys.stdout
+    elif output_file_path.endswith('.gz'):
+        f = gzip.open(output_file_path, 'wt', compresslevel=1, newline='')
+    else:
+        f = open(output_file_path, 'w', newline='', buffering=1 << 20)
+    try:
         writer = csv.writer(f, delimiter='\t')
         writer.writerow(fields)
-        writer.writerows(results)
+        if threads > 1:
+            # Each variant is independent given the lookup dicts, so fan the
+            # loop out over a pool and stream results back into the writer.
+            if 'fork' in multiprocessing.get_all_start_methods():
+                ctx = multiprocessing.get_context('fork')
+                _init_worker(UTRs_by_gene, Introns_by_transcript, cutoff)
+                pool = ctx.Pool(threads)
+            else:
+                pool = multiprocessing.Pool(threads, initializer=_init_worker,
+                                            initargs=(UTRs_by_gene, Introns_by_transcript, cutoff))
+            with pool:
+                for processed_variant in pool.imap_unordered(_process_variant_worker, variant_rows, chunksize=512):
+                    if processed_variant:
+                        writer.writerows(processed_variant)
+        else:
+            for variant in variant_rows:
+                processed_variant = process_variant_spliceai_2(variant, UTRs_by_gene, Introns_by_transcript, cutoff=cutoff)
+                if processed_variant:
+                    writer.writerows(processed_variant)
+    finally:
+        if f is not sys.stdout:
+            f.close()
 
 # Optional main function
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='Process variants with SpliceAI annotations.')
-    parser.add_argument('input_file', type=str, help='Path to the input variants file.')
-    parser.add_argument('output_file', type=str, help='Path to the output file.')
+    parser.add_argument('input_file', type=str, help="Path to the input variants file, or '-' for stdin.")
+    parser.add_argument('output_file', type=str, help="Path to the output file, or '-' for stdout.")
     parser.add_argument('--data-dir', type=str, default=os.path.join(os.path.expanduser("~"), ".5ULTRA", "data"), help='Path to the data directory.')
     parser.add_argument('--cutoff', type=float, default=0.2, help='Cutoff value for scores.')
+    parser.add_argument('--threads', type=int, default=1, help='Number of worker processes.')
     args = parser.parse_args()
 
     # Load variants
-    process_variants_spliceai_2(args.input_file, args.output_file, data_dir=args.data_dir, cutoff=args.cutoff)
+    process_variants_spliceai_2(args.input_file, args.output_file, data_dir=args.data_dir, cutoff=args.cutoff, threads=args.threads)
 
 if __name__ == "__main__":
     main()
@@ -1,31 +1,108 @@
 import csv
-import ast
 from math import nan
 from collections import defaultdict
+from functools import lru_cache
+import multiprocessing
+import pandas as pd
+import gzip
 import pysam
 import os
+import sys
 
-BASE_PAIRING = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G', 'N': 'N', '*': '*'}
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    njit = None
+
+_COMPLEMENT = str.maketrans('ATGCN*', 'TACGN*')
 KOZAK_STRENGTH = {'Weak': 0, 'Adequate': 1, 'Strong': 2, '': nan}
 STOP_CODONS = {'TAA', 'TAG', 'TGA'}
 
+if njit is not None:
+    # Integer coding for the compiled codon scan: A=0, C=1, G=2, T=3, other=4.
+    _SEQ_CODE = np.full(256, 4, dtype=np.uint8)
+    for _base_index, _base in enumerate(b'ACGT'):
+        _SEQ_CODE[_base] = _base_index
+
+    def _encode_seq(seq):
+        """Encodes a DNA string as a small-integer array for the compiled scan."""
+        return _SEQ_CODE[np.frombuffer(seq.encode('ascii'), dtype=np.uint8)]
+
+    @njit(cache=True)
+    def _scan_codons(arr, start, limit):
+        # Each codon is packed into a 9-bit integer (3 bits per base), so the
+        # stop test is a comparison against three constants rather than a
+        # base-by-base branch chain: TAA=0b011000000, TAG=0b011000010,
+        # TGA=0b011010000. Three bits hold every code including the ambiguous
+        # 4, so each packed value maps to exactly one codon and N-containing
+        # codons can never collide with a stop.
+        i = start
+        n = arr.shape[0]
+        while True:
+            if i + 2 < n:
+                codon = (arr[i] << 6) | (arr[i + 1] << 3) | arr[i + 2]
+                if codon == 0b011000000 or codon == 0b011000010 or codon == 0b011010000:
+                    break
+            if i >= n or i == limit:
+                break
+            i += 3
+        return i
+
+    def _scan_to_stop(seq, start, limit=-1, encoded=None):
+        """Advances from `start` in steps of 3 until a stop codon, the end of
+        the sequence or `limit`, and returns the final index.
+
+        Callers scanning the same sequence repeatedly can pass the result of
+        `_encode_seq(seq)` as `encoded` to avoid re-encoding per scan."""
+        if encoded is None:
+            encoded = _encode_seq(seq)
+        return int(_scan_codons(encoded, start, limit))
+else:
+    _encode_seq = None
+
+    def _scan_to_stop(seq, start, limit=-1, encoded=None):
+        """Advances from `start` in steps of 3 until a stop codon, the end of
+        the sequence or `limit`, and returns the final index."""
+        i = start
+        n = len(seq)
+        while seq[i:i + 3] not in STOP_CODONS and i < n and i != limit:
+            i += 3
+        return i
+
 def rev_seq(fwd_seq):
     """Reverse complements a DNA sequence."""
-    return ''.join(BASE_PAIRING.get(nuc, 'N') for nuc in reversed(fwd_seq))
+    return fwd_seq.translate(_COMPLEMENT)[::-1]
 
-def is_valid_number(value):
-    """Checks if a value can be converted to a float."""
-    try:
-        float(value)
-        return True
-    except ValueError:
-        return False
+def parse_exons(field):
+    """Parses a `"[(start, end), ...]"` exon field into a list of int pairs.
+
+    The field is always a literal list of integer tuples, so a split-based
+    parser is used instead of `ast.literal_eval`."""
+    exons = []
+    for chunk in field.strip('[] ').split('),'):
+        start, end = chunk.strip(' ()').split(',')
+        exons.append((int(start), int(end)))
+    return exons
+
+def parse_scores(values):
+    """Converts raw score strings to floats, skipping empty or malformed values."""
+    scores = []
+    for value in values:
+        if not value:
+            continue
+        try:
+            scores.append(float(value))
+        except ValueError:
+            pass
+    return scores
 
 def calculate_distance_from_five_cap(exons, strand, position):
-    """Calculates the distance from the 5' cap to a given genomic position."""
-    exons.sort(key=lambda x: x[0])
+    """Calculates the distance from the 5' cap to a given genomic position.
+
+    Assumes `exons` is already sorted by start position."""
     distance = 0
-    exons = exons if strand == '+' else list(reversed(exons))
+    exons = exons if strand == '+' else reversed(exons)
     for exon_start, exon_end in exons:
         if (strand == '+' and exon_end < position) or (strand == '-' and exon_start > position):
             distance += exon_end - exon_start + 1
@@ -35,9 +112,10 @@ def calculate_distance_from_five_cap(exons, strand, position):
     return distance
 
 def calculate_genomic_position_from_five_cap(exons, strand, distance):
-    """Calculates the genomic position from a given distance from the 5' cap."""
-    exons.sort(key=lambda x: x[0])
-    exons = exons if strand == '+' else list(reversed(exons))
+    """Calculates the genomic position from a given distance from the 5' cap.
+
+    Assumes `exons` is already sorted by start position."""
+    exons = exons if strand == '+' else reversed(exons)
     remaining_distance = distance
     for exon_start, exon_end in exons:
         exon_length = exon_end - exon_start + 1
@@ -48,84 +126,122 @@ def calculate_genomic_position_from_five_cap(exons, strand, distance):
     return exon_start + remaining_distance if strand == '+' else exon_end - remaining_distance
 
 def load_tsv_data(file_path):
-    """Loads TSV data from a file."""
-    data = []
+    """Yields TSV rows from a file one chunk at a time.
+
+    The C parser tokenizes the large UTR/uORF tables far faster than a
+    Python-level csv.reader; streaming in chunks keeps only the indexed
+    structures resident instead of a second full copy of the table. All
+    fields stay strings as before."""
     try:
-        with open(file_path, 'r') as file:
-            csv_reader = csv.reader(file, delimiter='\t')
-            for row in csv_reader:
-                data.append(row)
+        chunks = pd.read_csv(file_path, sep='\t', dtype=str, keep_default_na=False,
+                             header=None, engine='c', chunksize=8192)
+        for chunk in chunks:
+            yield from chunk.values.tolist()
     except FileNotFoundError:
-        print(f"File not found: {file_path}")
+        print(f"File not found: {file_path}", file=sys.stderr)
+    except pd.errors.EmptyDataError:
+        pass
     except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
-    return data
+        print(f"Error reading file {file_path}: {e}", file=sys.stderr)
 
 def load_vcf_data(vcf_path):
     """Loads VCF data from a file."""
     data = []
     try:
-        with open(vcf_path, 'r') as file:
+        # Read raw bytes and decode only the fields that are kept; skipping
+        # the meta-information lines on the byte prefix avoids per-line
+        # decoding of headers on large multisample VCFs.
+        with open(vcf_path, 'rb') as file:
             for line in file:
-                if line.startswith('##'):
+                if line[:2] == b'##':
                     continue
-                elif line.startswith('#CHROM'):
-                    parts = line.strip().split('\t')
-                    data.append(parts)
+                parts = line.strip().split(b'\t')
+                if line[:6] == b'#CHROM':
+                    data.append([part.decode() for part in parts])
                 else:
-                    parts = line.strip().split('\t')
-                    row = parts[:9]
-                    genotypes = [part.split(':')[0] for part in parts[9:]]
+                    row = [part.decode() for part in parts[:9]]
+                    genotypes = [part.split(b':', 1)[0].decode() for part in parts[9:]]
                     data.append(row + genotypes)
     except FileNotFoundError:
-        print(f"File not found: {vcf_path}")
+        print(f"File not found: {vcf_path}", file=sys.stderr)
     except Exception as e:
-        print(f"Error reading file {vcf_path}: {e}")
+        print(f"Error reading file {vcf_path}: {e}", file=sys.stderr)
     return data
 
 def calculate_kozak_strength(kozak_sequence):
     """Determines the Kozak sequence strength."""
     if not kozak_sequence or len(kozak_sequence) < 9:
         return ''
-    conditions = [kozak_sequence[1] in ['A', 'G'], kozak_sequence[-2] == 'G']
-    if all(conditions):
+    purine_minus_three = kozak_sequence[1] == 'A' or kozak_sequence[1] == 'G'
+    guanine_plus_four = kozak_sequence[-2] == 'G'
+    if purine_minus_three and guanine_plus_four:
         return 'Strong'
-    elif any(conditions):
+    elif purine_minus_three or guanine_plus_four:
         return 'Adequate'
     else:
         return 'Weak'
 
+_tabix_handles = {}
+
+def _get_tabix(file_path):
+    """Returns a TabixFile handle, opened once per process and reused."""
+    handle = _tabix_handles.get(file_path)
+    if handle is None:
+        handle = pysam.TabixFile(file_path)
+        _tabix_handles[file_path] = handle
+    return handle
+
+@lru_cache(maxsize=1 << 20)
 def get_score(chrom, pos, file_path):
     try:
-        with pysam.TabixFile(file_path) as tabix_file:  
-            records = tabix_file.fetch(chrom, pos - 1, pos)
-            for record in records:
-                return record.split('\t')[-1]
-            return None
+        tabix_file = _get_tabix(file_path)
+        records = tabix_file.fetch(chrom, pos - 1, pos)
+        for record in records:
+            return record.split('\t')[-1]
+        return None
     except OSError as e:
-        print(f"OSError accessing file: {e}")
+        print(f"OSError accessing file: {e}", file=sys.stderr)
         return None
     except ValueError as e:
-        print(f"ValueError (likely malformed input): {e}")
+        print(f"ValueError (likely malformed input): {e}", file=sys.stderr)
         return None
     except KeyError as e:
-        print(f"KeyError (likely missing chromosome): {e}")
+        print(f"KeyError (likely missing chromosome): {e}", file=sys.stderr)
         return None
     except pysam.utils.SamtoolsError as e: 
-        print(f"Pysam/Samtools error: {e}")
+        print(f"Pysam/Samtools error: {e}", file=sys.stderr)
         return None
     except Exception as e:
-        print(f"An unexpected error: {e}")
+        print(f"An unexpected error: {e}", file=sys.stderr)
         return None
 
+@lru_cache(maxsize=1 << 20)
+def get_scores(chrom, start_pos, end_pos, file_path):
+    """Returns the scores overlapping the 1-based inclusive range.
+
+    Results are memoized per process: dense inputs hit the same uStart
+    windows repeatedly and skip the tabix fetch entirely."""
+    try:
+        tabix_file = _get_tabix(file_path)
+        return tuple(record.split('\t')[-1] for record in tabix_file.fetch(chrom, start_pos - 1, end_pos))
+    except OSError as e:
+        print(f"OSError accessing file: {e}", file=sys.stderr)
+    except ValueError as e:
+        print(f"ValueError (likely malformed input): {e}", file=sys.stderr)
+    except KeyError as e:
+        print(f"KeyError (likely missing chromosome): {e}", file=sys.stderr)
+    except pysam.utils.SamtoolsError as e:
+        print(f"Pysam/Samtools error: {e}", file=sys.stderr)
+    except Exception as e:
+        print(f"An unexpected error: {e}", file=sys.stderr)
+    return ()
+
 def uStart_gain(relativePosition, mutatedSequence, startPOS, STRAND, exons, CHR, data_dir, POS, type, wtSEQ):
     """Annotates created uORFs (uStart gain)."""
-    uORF_START = relativePosition - 2
-    while mutatedSequence[uORF_START: uORF_START + 3] != 'ATG':
-        uORF_START += 1
-    uORF_END = uORF_START + 3
-    while mutatedSequence[uORF_END: uORF_END + 3] not in STOP_CODONS and uORF_END < len(mutatedSequence):
-        uORF_END += 3
+    # The caller guarantees the window contains an ATG; find() locates it at
+    # memchr speed instead of a per-character slice-compare loop.
+    uORF_START = mutatedSequence.find('ATG', max(relativePosition - 2, 0))
+    uORF_END = _scan_to_stop(mutatedSequence, uORF_START + 3)
     uORF_END += 2
     uSTART_mSTART_DIST = startPOS - uORF_START
     uSTOP_CODON = mutatedSequence[uORF_END - 2: uORF_END + 1]
@@ -162,19 +278,12 @@ def uStart_gain(relativePosition, mutatedSequence, startPOS, STRAND, exons, CHR,
         pos1, pos2, pos3 = uORF_START_GENOMIC, uORF_START_GENOMIC + 1, uORF_START_GENOMIC + 2
     else:
         pos1, pos2, pos3 = uORF_START_GENOMIC, uORF_START_GENOMIC - 1, uORF_START_GENOMIC - 2
-    phyloP_scores = [
-        get_score(CHR, pos1, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phyloP100way', f"{CHR}.bed.gz")),
-        get_score(CHR, pos2, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phyloP100way', f"{CHR}.bed.gz")),
-        get_score(CHR, pos3, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phyloP100way', f"{CHR}.bed.gz"))
-    ]
-    phyloP_scores = [float(score) for score in phyloP_scores if score and is_valid_number(score)]
+    lo, hi = (pos1, pos3) if STRAND == '+' else (pos3, pos1)
+    phyloP_scores = parse_scores(get_scores(
+        CHR, lo, hi, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phyloP100way', f"{CHR}.bed.gz")))
     mean_phylop = sum(phyloP_scores) / len(phyloP_scores) if phyloP_scores else "NA"
-    phastCons_scores = [
-        get_score(CHR, pos1, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phastCons100way', f"{CHR}.bed.gz")),
-        get_score(CHR, pos2, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phastCons100way', f"{CHR}.bed.gz")),
-        get_score(CHR, pos3, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phastCons100way', f"{CHR}.bed.gz"))
-    ]
-    phastCons_scores = [float(score) for score in phastCons_scores if score and is_valid_number(score)]
+    phastCons_scores = parse_scores(get_scores(
+        CHR, lo, hi, os.path.join(os.path.expanduser(data_dir), '5UTR.hg38.phastCons100way', f"{CHR}.bed.gz")))
     mean_phastcons = sum(phastCons_scores) / len(phastCons_scores) if phastCons_scores else "NA"
     return [
         uORF_START_GENOMIC, uORF_END_GENOMIC, '000', uSTART_mSTART_DIST, 'ATG',
@@ -183,34 +292,44 @@ def uStart_gain(relativePosition, mutatedSequence, startPOS, STRAND, exons, CHR,
     ]
 
 def process_variant_spliceai_3(variant, utrs_by_transcript, uorfs_by_transcript, data_dir):
+    """Yields annotated output rows for a single variant."""
     if not variant[1].isdigit():
-        print(f"Warning: Skipping variant with invalid position value: {variant}")
-        return None
+        print(f"Warning: Skipping variant with invalid position value: {variant}", file=sys.stderr)
+        return
     CHR = variant[0] if 'chr' in variant[0] else 'chr' + variant[0]
     POS = int(variant[1])
     REF = variant[3]
     ALT = variant[4] if variant[4] != '<DEL>' else ''
     ALT = ALT if ALT != '.' else ''
     transcript_utrs = utrs_by_transcript.get(variant[-3], [])
-    result = []
+    if not transcript_utrs:
+        return
+    variant_prefix = variant[-2].split('_') + variant[5:-4] + [variant[-4], variant[-1]]
     for UTR in transcript_utrs:
-        CSQ = [[],[]]
-        uORFAnnotations = []
+        annotations = []
         # check if variant is in the 5UTR bondaries
-        if not (int(UTR[1]) <= POS <= int(UTR[2])):
+        if not (UTR[1] <= POS <= UTR[2]):
             continue
-        exons = ast.literal_eval(UTR[13])
+        exons = UTR[13]
         # retreive relative position, wild type and mutated sequences
         if UTR[3] == '+':
             relativePosition = calculate_distance_from_five_cap(exons, UTR[3], POS)
         else:
             relativePosition = calculate_distance_from_five_cap(exons, UTR[3], POS + len(REF) - 1)
         wtSEQ = UTR[12]
-        mutatedSequence = wtSEQ[:relativePosition] + ALT + wtSEQ[relativePosition+len(REF):] if UTR[3] == '+' \
-            else wtSEQ[:relativePosition] + rev_seq(ALT) + wtSEQ[relativePosition+len(REF):]
-        startPOS = calculate_distance_from_five_cap(exons, UTR[3], int(UTR[2])) if UTR[3] == '+' \
-            else calculate_distance_from_five_cap(exons, UTR[3], int(UTR[1]))
+        mutALT = ALT if UTR[3] == '+' else rev_seq(ALT)
+        startPOS = calculate_distance_from_five_cap(exons, UTR[3], UTR[2]) if UTR[3] == '+' \
+            else calculate_distance_from_five_cap(exons, UTR[3], UTR[1])
         startPOS += len(ALT) - len(REF)
+        # Fast path: a SNV in a 5'UTR without uORFs can only yield a hit if it
+        # creates an ATG around the variant or touches the mStart Kozak
+        # context, so test both on the local window before building the full
+        # mutated sequence.
+        if len(REF) == 1 and len(ALT) == 1 and float(UTR[14]) == 0:
+            window = wtSEQ[max(relativePosition - 2, 0):relativePosition] + mutALT + wtSEQ[relativePosition + 1:relativePosition + 3]
+            if 'ATG' not in window and not (startPOS - 4 <= relativePosition <= startPOS + 4):
+                continue
+        mutatedSequence = wtSEQ[:relativePosition] + mutALT + wtSEQ[relativePosition+len(REF):]
         # exclude mStart loss variants
         if 'ATG' != mutatedSequence[startPOS :startPOS +3]:
             continue
@@ -221,34 +340,30 @@ def process_variant_spliceai_3(variant, utrs_by_transcript, uorfs_by_transcript,
                 # compare WT kozak strength with the Mutated kozak strength
                 newKOZAK_STRENGTH = calculate_kozak_strength(newKOZAK)
                 newKOZAK_STRENGTH = UTR[10] if newKOZAK_STRENGTH == '' else newKOZAK_STRENGTH
-                if KOZAK_STRENGTH[newKOZAK_STRENGTH] < KOZAK_STRENGTH[UTR[11]]:
-                    CSQ[0].extend(['mKozak'])
-                    CSQ[1].extend(['decreased'])
-                    uORFAnnotations += [['']*15]
-                if KOZAK_STRENGTH[newKOZAK_STRENGTH] > KOZAK_STRENGTH[UTR[11]]:
-                    CSQ[0].extend(['mKozak'])
-                    CSQ[1].extend(['increased'])
-                    uORFAnnotations += [['']*15]
+                new_rank = KOZAK_STRENGTH[newKOZAK_STRENGTH]
+                wt_rank = KOZAK_STRENGTH[UTR[11]]
+                if new_rank < wt_rank:
+                    annotations.append(('mKozak', 'decreased', [''] * 15))
+                if new_rank > wt_rank:
+                    annotations.append(('mKozak', 'increased', [''] * 15))
         # uStart gain
-        if 'ATG' in mutatedSequence[relativePosition-2: relativePosition+len(ALT)+2] and 'ATG' not in wtSEQ[ relativePosition-2: relativePosition+len(REF)+2]:
-            CSQ[0].extend(['uStart_gain'])
+        if relativePosition >= 2 and mutatedSequence.find('ATG', relativePosition-2, relativePosition+len(ALT)+2) != -1 \
+                and wtSEQ.find('ATG', relativePosition-2, relativePosition+len(REF)+2) == -1:
             Anno = uStart_gain(relativePosition, mutatedSequence, startPOS, UTR[3], exons, CHR, data_dir, POS, variant[-1], wtSEQ)
-            uORFAnnotations += [Anno]
-            if uORFAnnotations[-1][6] != 'N-terminal extension':
-                CSQ[1].extend(['decreased'])
-            else: CSQ[1].extend(['N-terminal extension'])
-        elif relativePosition < 2 and 'ATG' in mutatedSequence[: relativePosition+len(ALT)+2] and 'ATG' not in wtSEQ[: relativePosition+len(REF)+2]:
-            CSQ[0].append('uStart_gain')
+            annotations.append(('uStart_gain', 'N-terminal extension' if Anno[6] == 'N-terminal extension' else 'decreased', Anno))
+        elif relativePosition < 2 and mutatedSequence.find('ATG', 0, relativePosition+len(ALT)+2) != -1 \
+                and wtSEQ.find('ATG', 0, relativePosition+len(REF)+2) == -1:
             Anno = uStart_gain(relativePosition, mutatedSequence, startPOS, UTR[3], exons, CHR, data_dir, POS, variant[-1], wtSEQ)
-            uORFAnnotations.append(Anno)
-            CSQ[1].append('N-terminal extension' if uORFAnnotations[-1][6] == 'N-terminal extension' else 'decreased')
+            annotations.append(('uStart_gain', 'N-terminal extension' if Anno[6] == 'N-terminal extension' else 'decreased', Anno))
         # check if 5UTR has existing uORF(s)
         if float(UTR[14]) != 0:
             transcript_ids = UTR[6]
             transcript_uorfs = uorfs_by_transcript.get(transcript_ids,[])
+            # Encode once so every uORF scan shares the same buffer.
+            encodedSequence = _encode_seq(mutatedSequence) if _encode_seq else None
             for uORF in transcript_uorfs:
-                uSTART = int(uORF[8]) - int(uORF[17])
-                uSTOP = uSTART + int(uORF[23]) -3
+                uSTART = uORF[8] - uORF[17]
+                uSTOP = uSTART + uORF[23] -3
                 if uSTOP >= relativePosition and len(REF) < len(ALT):
                     if uSTART >= relativePosition:
                         uSTART += len(ALT) -1
@@ -261,113 +376,177 @@ def process_variant_spliceai_3(variant, utrs_by_transcript, uorfs_by_transcript,
                 if (uSTART-6 <= relativePosition <= uSTOP+2) or (relativePosition <= uSTART <= relativePosition + len(REF)):
                     # uStart loss & uKozak
                     if mutatedSequence[uSTART : uSTART +3] != uORF[18] and mutatedSequence[uSTART : uSTART +3] != 'ATG':
-                        CSQ[0].extend(['uStart_loss'])
-                        CSQ[1].extend(['increased'])
-                        Anno = uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]
-                        uORFAnnotations += [Anno]
+                        annotations.append(('uStart_loss', 'increased', uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]))
                         continue
                     # scan frame for STOP then uStop gain & uStop loss
-                    codon = uSTART
-                    while mutatedSequence[codon : codon +3] not in STOP_CODONS and codon < len(mutatedSequence) and codon != startPOS:
-                        codon += 3
+                    codon = _scan_to_stop(mutatedSequence, uSTART, startPOS, encodedSequence)
                     NewUstopCodon = mutatedSequence[codon : codon+3]
                     if codon < uSTOP and codon +2 < startPOS:
                         if uORF[20] == 'Overlapping':
-                            CSQ[0].extend(['uStop_gain to Non-Overlapping'])
-                            CSQ[1].extend(['increased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_gain to Non-Overlapping', 'increased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                             continue
                         elif uORF[20] == 'N-terminal extension':
-                            CSQ[0].extend(['uStop_gain to Non-Overlapping'])
-                            CSQ[1].extend(['decreased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_gain to Non-Overlapping', 'decreased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                         elif uORF[20] == 'Non-Overlapping':
-                            CSQ[0].extend(['uStop_gain shorter Non-Overlapping'])
-                            CSQ[1].extend(['increased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_gain shorter Non-Overlapping', 'increased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                             continue
                     elif codon < uSTOP and codon == startPOS and uORF[20] == 'Overlapping':
-                        CSQ[0].extend(['uStop_gain to N-terminal extension'])
-                        CSQ[1].extend(['N-terminal extension'])
-                        Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19]] + uORF[20:-4] + uORF[-3:]
-                        uORFAnnotations += [Anno]
+                        annotations.append(('uStop_gain to N-terminal extension', 'N-terminal extension',
+                                            uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19]] + uORF[20:-4] + uORF[-3:]))
                     elif codon > uSTOP and uORF[20] != 'Overlapping':
                         if codon == startPOS and uORF[20] != 'N-terminal extension':
-                            CSQ[0].extend(['uStop_loss to N-terminal extension'])
-                            CSQ[1].extend(['N-terminal extension'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_loss to N-terminal extension', 'N-terminal extension',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                         elif codon > startPOS:
-                            CSQ[0].extend(['uStop_loss to Overlapping'])
-                            CSQ[1].extend(['decreased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_loss to Overlapping', 'decreased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                         elif uORF[20] == 'Non-Overlapping':
-                            CSQ[0].extend(['uStop_loss longer Non-Overlapping'])
-                            CSQ[1].extend(['decreased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
+                            annotations.append(('uStop_loss longer Non-Overlapping', 'decreased',
+                                                uORF[1:3] + [uORF[4]] + uORF[17:19] + [uORF[19] + " > " + NewUstopCodon] + uORF[20:-4] + uORF[-3:]))
                     if uSTART -1 == relativePosition or relativePosition == uSTART -3 or relativePosition == uSTART +3:
                         newKOZAK = mutatedSequence[uSTART -4 :uSTART +5]
                         # compare WT kozak strength with the Mutated kozak strength
                         newKOZAK_STRENGTH = calculate_kozak_strength(newKOZAK)
                         newKOZAK_STRENGTH = uORF[22] if newKOZAK_STRENGTH == '' else newKOZAK_STRENGTH
-                        if KOZAK_STRENGTH[newKOZAK_STRENGTH] < KOZAK_STRENGTH[uORF[22]]:
-                            CSQ[0].extend(['uKozak'])
-                            CSQ[1].extend(['increased'])
-                            Anno = uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
-                        elif KOZAK_STRENGTH[newKOZAK_STRENGTH] > KOZAK_STRENGTH[uORF[22]]:
-                            CSQ[0].extend(['uKozak'])
-                            CSQ[1].extend(['decreased'])
-                            Anno= uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]
-                            uORFAnnotations += [Anno]
-        count = 0
-        for hit in CSQ[0]:
-            result.append(variant[-2].split('_') + variant[5:-4] + [variant[-4], variant[-1]] + [hit, CSQ[1][count]] + UTR[1:12] + UTR[14:] + uORFAnnotations[count])
-            count += 1
-    return result
-
-def process_variants_spliceai_3(input_file_path, output_file_path, data_dir='~/.5ULTRA/data'):
-    """Processes all variants and writes the results to the output file."""
+                        new_rank = KOZAK_STRENGTH[newKOZAK_STRENGTH]
+                        uORF_rank = KOZAK_STRENGTH[uORF[22]]
+                        if new_rank < uORF_rank:
+                            annotations.append(('uKozak', 'increased', uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]))
+                        elif new_rank > uORF_rank:
+                            annotations.append(('uKozak', 'decreased', uORF[1:3] + [uORF[4]] + uORF[17:-4] + uORF[-3:]))
+        if annotations:
+            UTR_fields = UTR[1:12] + UTR[14:]
+            for csq, translation, anno in annotations:
+                yield variant_prefix + [csq, translation] + UTR_fields + anno
+
+# Worker state for the multiprocessing pool. With the fork start method the
+# parent populates these globals before creating the pool and workers inherit
+# them copy-on-write, so the large lookup dicts are never pickled; elsewhere
+# they are sent once per worker through _init_worker.
+_worker_utrs_by_transcript = None
+_worker_uorfs_by_transcript = None
+_worker_data_dir = None
+
+def _init_worker(utrs_by_transcript, uorfs_by_transcript, data_dir):
+    global _worker_utrs_by_transcript, _worker_uorfs_by_transcript, _worker_data_dir
+    _worker_utrs_by_transcript = utrs_by_transcript
+    _worker_uorfs_by_transcript = uorfs_by_transcript
+    _worker_data_dir = data_dir
+
+def _process_variant_worker(variant):
+    # Materialize the generator so the rows can travel back through the pool.
+    return list(process_variant_spliceai_3(variant, _worker_utrs_by_transcript,
+                                           _worker_uorfs_by_transcript, _worker_data_dir))
+
+def process_variants_spliceai_3(input_file_path, output_file_path, data_dir='~/.5ULTRA/data', threads=1):
+    """Processes all variants and writes the results to the output file.
+
+    `input_file_path`/`output_file_path` may be '-' for stdin/stdout, so the
+    stage can sit in a shell pipeline."""
     UTR_FILE_PATH = os.path.join(os.path.expanduser(data_dir), '5UTRs.tsv')
     UORF_FILE_PATH = os.path.join(os.path.expanduser(data_dir), 'uORFs.tsv')
+    # stdin cannot be rewound for the transcript-collection prepass, so its
+    # rows are materialized; file inputs keep the chunked reader.
+    input_rows = list(csv.reader(sys.stdin, delimiter='\t')) if input_file_path == '-' else None
+    # First pass over the variants: collect the transcripts they reference,
+    # so only those rows of the UTR and uORF tables (which carry the full
+    # 5'UTR sequences) are parsed and kept resident.
+    wanted_transcripts = set()
+    for variant in (input_rows if input_rows is not None else load_tsv_data(input_file_path)):
+        wanted_transcripts.add(variant[-3])
     UTRs = load_tsv_data(UTR_FILE_PATH)
     uORFs = load_tsv_data(UORF_FILE_PATH)
-    variants = load_tsv_data(input_file_path)
+    variants = iter(input_rows) if input_rows is not None else load_tsv_data(input_file_path)
     utrs_by_transcript = defaultdict(list)
     uorfs_by_transcript = defaultdict(list)
-    for UTR in UTRs[1:]:
+    UTR_headers = next(UTRs, [])
+    for UTR in UTRs:
+        if UTR[6] not in wanted_transcripts:
+            continue
+        # Cast the 5'UTR boundaries and parse the exon list once at load time
+        # instead of per variant-UTR pair.
+        UTR[1] = int(UTR[1])
+        UTR[2] = int(UTR[2])
+        UTR[13] = sorted(parse_exons(UTR[13]))
         TRANSCRIPT = UTR[6]
         utrs_by_transcript[TRANSCRIPT].append(UTR)
-    UTR_headers = UTRs[0]
-    for uORF in uORFs[1:]:
+    uORF_headers = next(uORFs, [])
+    for uORF in uORFs:
+        if uORF[5] not in wanted_transcripts:
+            continue
+        # Cast the uORF coordinates once at load time; the inner uORF loop
+        # re-derived them from strings for every variant.
+        uORF[8] = int(uORF[8])
+        uORF[17] = int(uORF[17])
+        uORF[23] = int(uORF[23])
         TRANSCRIPTS = uORF[5]
         uorfs_by_transcript[TRANSCRIPTS].append(uORF)
-    uORF_headers = uORFs[0]
-    with open(output_file_path, 'w', newline='') as f:
+    if output_file_path == '-':
+        f = sys.stdout
+    elif output_file_path.endswith('.gz'):
+        # Level-1 gzip: a small CPU cost for a large reduction in bytes
+        # moved between stages. pandas picks the compression up from the
+        # extension on the reading side.
+        f = gzip.open(output_file_path, 'wt', compresslevel=1, newline='')
+    else:
+        f = open(output_file_path, 'w', newline='')
+    try:
         writer = csv.writer(f, delimiter='\t')
-        fields = variants[0][:-4] + [variants[0][-4], variants[0][-1]] + ['CSQ', 'translation'] + UTR_headers[1:12] + UTR_headers[14:] + uORF_headers[1:3] + [uORF_headers[4]] + uORF_headers[17:-4] + uORF_headers[-3:]
+        variant_headers = next(variants)
+        fields = variant_headers[:-4] + [variant_headers[-4], variant_headers[-1]] + ['CSQ', 'translation'] + UTR_headers[1:12] + UTR_headers[14:] + uORF_headers[1:3] + [uORF_headers[4]] + uORF_headers[17:-4] + uORF_headers[-3:]
         writer.writerow(fields)
-        for variant in variants[1:]:
-            if ',' in variant[4]:
-                continue
-            processed_variant = process_variant_spliceai_3(variant, utrs_by_transcript, uorfs_by_transcript, data_dir)
-            if processed_variant:
-                writer.writerows(processed_variant)
+        variant_rows = (variant for variant in variants if ',' not in variant[4])
+
+        def annotated_rows():
+            if threads > 1:
+                # Each variant is independent given the lookup dicts, so fan
+                # the loop out over a pool and stream results back.
+                if 'fork' in multiprocessing.get_all_start_methods():
+                    ctx = multiprocessing.get_context('fork')
+                    _init_worker(utrs_by_transcript, uorfs_by_transcript, data_dir)
+                    pool = ctx.Pool(threads)
+                else:
+                    pool = multiprocessing.Pool(threads, initializer=_init_worker,
+                                                initargs=(utrs_by_transcript, uorfs_by_transcript, data_dir))
+                with pool:
+                    for processed_variant in pool.imap_unordered(_process_variant_worker, variant_rows, chunksize=512):
+                        yield from processed_variant
+            else:
+                for variant in variant_rows:
+                    yield from process_variant_spliceai_3(variant, utrs_by_transcript, uorfs_by_transcript, data_dir)
+
+        # Data rows never contain quoting-sensitive characters, so format
+        # them with a plain join and flush in ~1 MiB batches; the csv module's
+        # per-field quoting checks are kept only for the header.
+        buffer = []
+        buffered = 0
+        for row in annotated_rows():
+            line = '\t'.join(map(str, row)) + '\r\n'
+            buffer.append(line)
+            buffered += len(line)
+            if buffered >= 1 << 20:
+                f.write(''.join(buffer))
+                buffer.clear()
+                buffered = 0
+        if buffer:
+            f.write(''.join(buffer))
+    finally:
+        if f is not sys.stdout:
+            f.close()
 
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='Detect variants.')
-    parser.add_argument('input_file_path', type=str, help='Path to the filtered input file.')
-    parser.add_argument('output_file_path', type=str, help='Path to the detection output file.')
+    parser.add_argument('input_file_path', type=str, help="Path to the filtered input file, or '-' for stdin.")
+    parser.add_argument('output_file_path', type=str, help="Path to the detection output file, or '-' for stdout.")
     parser.add_argument('--data-dir', type=str, default=os.path.join(os.path.expanduser("~"), ".5ULTRA", "data"), help='Path to the data directory.')
+    parser.add_argument('--threads', type=int, default=1, help='Number of worker processes.')
     args = parser.parse_args()
 
-    process_variants_spliceai_3(args.input_file_path, args.output_file_path, data_dir=args.data_dir)
+    process_variants_spliceai_3(args.input_file_path, args.output_file_path, data_dir=args.data_dir, threads=args.threads)
 
 if __name__ == "__main__":
     main()